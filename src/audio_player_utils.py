@@ -1,216 +1,341 @@
 import asyncio
+import collections
+import logging
+import threading
 import pyaudio
 import numpy as np
-from concurrent.futures import ThreadPoolExecutor
-from PyQt5.QtCore import QMetaObject, Q_ARG, Qt
 from PyQt5 import QtGui
 
+logger = logging.getLogger(__name__)
+
+FRAMES_PER_BUFFER = 512  # 默认每次回调向 PortAudio 提供的帧数，越小暂停/恢复越灵敏
+RING_CAPACITY = 1 << 20  # 环形缓冲帧数，24kHz 下约 43 秒，足够容纳正在播放和排队的两块
+INT16_SCALE = 32767
+
+def _set_events(events):
+    for event in events:
+        event.set()
+
+class Float32Pool:
+    """按长度分桶复用 float32 缓冲，桶大小向上取整到 2 的幂"""
+    def __init__(self, max_per_bucket=4, min_size=1 << 10, max_size=1 << 22):
+        self.max_per_bucket = max_per_bucket
+        self.min_size = min_size
+        self.max_size = max_size
+        self._buckets = collections.defaultdict(list)
+        self._lock = threading.Lock()  # 生产者（TTS 线程）与播放协程可能并发访问
+
+    @staticmethod
+    def _bucket_size(n):
+        return 1 << max(n - 1, 0).bit_length()
+
+    def acquire(self, n):
+        """取得长度为 n 的 float32 数组（内容未初始化）"""
+        size = self._bucket_size(n)
+        if not (self.min_size <= size <= self.max_size):
+            return np.empty(n, dtype=np.float32)
+        with self._lock:
+            bucket = self._buckets.get(size)
+            base = bucket.pop() if bucket else None
+        if base is None:
+            base = np.empty(size, dtype=np.float32)
+        return base[:n]
+
+    def release(self, arr):
+        """归还不再使用的数组，非标准大小或只读的数组直接丢弃"""
+        base = arr.base if isinstance(arr.base, np.ndarray) else arr
+        if (not isinstance(base, np.ndarray) or base.dtype != np.float32 or base.ndim != 1
+                or not base.flags.owndata or not base.flags.writeable or not arr.flags.writeable):
+            return
+        size = base.size
+        if size & (size - 1) or not (self.min_size <= size <= self.max_size):
+            return
+        with self._lock:
+            bucket = self._buckets[size]
+            if len(bucket) < self.max_per_bucket:
+                bucket.append(base)
+
 class AudioPlayer:
-    def __init__(self, gui_instance):
+    def __init__(self, gui_instance, frames_per_buffer=FRAMES_PER_BUFFER):
         self.gui_instance = gui_instance
+        # 256~512 适合低延迟，性能较弱的设备（如树莓派）可调大以减少欠载
+        self.frames_per_buffer = frames_per_buffer
         self.pyaudio_instance = None
         self.stream = None
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        self._stream_rate = None  # 当前输出流的采样率
         self.current_stream = None
-        self.is_paused = False
-        self.is_stopped = False
-        self._lock = asyncio.Lock()  # 添加锁以保护并发访问
+        # 控制信号用事件表示，set()/clear() 无需加锁
+        self._stop_evt = asyncio.Event()  # 已停止时置位
+        self._resume_evt = asyncio.Event()  # 未暂停时置位
+        self._resume_evt.set()
+        self.buffer_pool = Float32Pool()  # 供上游 TTS 申请音频缓冲，播放完成后回收
+        self._lock = asyncio.Lock()  # 仅保护流的打开/关闭，不跨越播放等待
+        # 回调模式的预分配环形缓冲：协程把量化后的数据直接写入尾部，PortAudio 线程从头部读取
+        self._ring = np.zeros(RING_CAPACITY, dtype=np.int16)
+        self._out_buf = np.zeros(frames_per_buffer, dtype=np.int16)  # 回调输出缓冲
+        self._queued_frames = 0  # 累计写入的帧数（尾）
+        self._played_frames = 0  # 累计被回调取走的帧数（头）
+        self._waiters = collections.deque()  # (帧位置, asyncio.Event)，按位置递增
+        self._loop = None  # 播放所在的事件循环，首次等待时缓存，供回调线程唤醒等待者
+        self._last_highlight = None  # 最近一次请求界面高亮的 (页码, 文本)
+        self._loop_task = None  # run_audio_player_loop 所在的任务，停止时直接取消
+
+    @property
+    def is_stopped(self):
+        return self._stop_evt.is_set()
+
+    @property
+    def is_paused(self):
+        return not self._resume_evt.is_set()
 
     def _init_pyaudio(self, sample_rate):
+        """按采样率缓存输出流，只有采样率变化时才重新打开"""
         if self.pyaudio_instance is None:
             self.pyaudio_instance = pyaudio.PyAudio()
-        if self.stream is None or not self.stream.is_active():
-            if self.stream:
-                self.stream.stop_stream()
-                self.stream.close()
-            self.stream = self.pyaudio_instance.open(format=pyaudio.paFloat32,
-                                                     channels=1,
-                                                     rate=sample_rate,
-                                                     output=True)
+        if self.stream is not None and sample_rate == self._stream_rate:
+            # 同一采样率下复用已有的流，未激活时重新启动即可（暂停中保持停止）
+            if not self.stream.is_active() and not self.is_paused:
+                self.stream.start_stream()
+            return
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+        self.stream = self.pyaudio_instance.open(format=pyaudio.paInt16,
+                                                 channels=1,
+                                                 rate=sample_rate,
+                                                 output=True,
+                                                 frames_per_buffer=self.frames_per_buffer,
+                                                 stream_callback=self._pa_callback,
+                                                 start=not self.is_paused)
+        self._stream_rate = sample_rate
+
+    def _pa_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio 回调（运行在音频线程）：从环形缓冲取出 frame_count 帧，数据不足时补静音"""
+        if frame_count > self._out_buf.size:
+            self._out_buf = np.zeros(frame_count, dtype=np.int16)
+        out = self._out_buf[:frame_count]
+        n = min(frame_count, self._queued_frames - self._played_frames)
+        head = self._played_frames % self._ring.size
+        first = min(n, self._ring.size - head)
+        out[:first] = self._ring[head:head + first]
+        out[first:n] = self._ring[:n - first]
+        out[n:] = 0
+        self._played_frames += n
+        self._notify_played()
+        return out.tobytes(), pyaudio.paContinue
+
+    def _notify_played(self):
+        """唤醒所有数据已被回调取完的等待者"""
+        if not self._waiters or self._waiters[0][0] > self._played_frames:
+            return
+        # 一次回调可能越过多个很短的块，合并成一次跨线程唤醒
+        events = []
+        while self._waiters and self._waiters[0][0] <= self._played_frames:
+            events.append(self._waiters.popleft()[1])
+        try:
+            self._loop.call_soon_threadsafe(_set_events, events)
+        except RuntimeError:
+            pass  # 事件循环已关闭
+
+    def _reset_pending(self):
+        """丢弃未播放的数据并唤醒所有等待者，须在流停止后调用"""
+        self._played_frames = self._queued_frames
+        self._notify_played()
 
     async def stop_current_audio(self):
         """停止当前正在播放的音频"""
-        async with self._lock:  # 使用锁来保护资源访问
-            self.is_stopped = True  # 首先设置停止标志
-            self.is_paused = False  # 重置暂停状态
-            
-            if self.stream:
-                try:
-                    if self.stream.is_active():
-                        self.stream.stop_stream()
-                    self.stream.close()
-                except Exception as e:
-                    print(f"Error stopping stream: {e}")
-                self.stream = None
-                
-            if self.pyaudio_instance:
-                try:
-                    self.pyaudio_instance.terminate()
-                except Exception as e:
-                    print(f"Error terminating PyAudio: {e}")
-                self.pyaudio_instance = None
-
-    def _play_blocking(self, audio_array_bytes, sample_rate):
-        p = pyaudio.PyAudio()
-        self.stream = p.open(format=pyaudio.paFloat32, channels=1, rate=sample_rate, output=True)
-        self.stream.write(audio_array_bytes)
-        self.stream.stop_stream()
-        self.stream.close()
-        p.terminate()
-        self.stream = None
+        self._stop_evt.set()  # 首先设置停止标志
+        self._resume_evt.set()  # 重置暂停状态
+        # 取消播放循环，使其立即从 audio_queue.get() 中退出
+        if (self._loop_task and not self._loop_task.done()
+                and self._loop_task is not asyncio.current_task()):
+            self._loop_task.cancel()
+        await self._release_audio()
 
-    async def play_audio_chunk_async(self, audio_array, sample_rate):
-        """异步播放音频块"""
+    async def _release_audio(self, context=""):
+        """摘下流和 PyAudio 实例后在线程中关闭，锁只保护摘下这一步"""
         async with self._lock:
-            if self.is_stopped:
-                return
-                
-            audio_bytes = audio_array.tobytes() if isinstance(audio_array, np.ndarray) else audio_array
-            
-            # 初始化 PyAudio 实例和流
-            if not self.pyaudio_instance:
-                self.pyaudio_instance = pyaudio.PyAudio()
-                
-            if not self.stream or not self.stream.is_active():
-                self.stream = self.pyaudio_instance.open(
-                    format=pyaudio.paFloat32,
-                    channels=1,
-                    rate=sample_rate,
-                    output=True
-                )
-                
+            stream, pyaudio_instance = self.stream, self.pyaudio_instance
+            self.stream = None
+            self._stream_rate = None
+            self.pyaudio_instance = None
+        if stream or pyaudio_instance:
+            # Pa_StopStream/Pa_Terminate 需要等待音频线程退出，可能耗时上百毫秒
+            await asyncio.to_thread(self._close_audio, stream, pyaudio_instance, context)
+        self._reset_pending()
+
+    @staticmethod
+    def _close_audio(stream, pyaudio_instance, context=""):
+        if stream:
+            try:
+                if stream.is_active():
+                    stream.stop_stream()
+                stream.close()
+            except Exception as e:
+                logger.error("Error stopping stream%s: %s", context, e)
+        if pyaudio_instance:
             try:
-                await asyncio.get_event_loop().run_in_executor(
-                    self.executor, 
-                    self._play_blocking, 
-                    audio_bytes, 
-                    sample_rate
-                )
+                pyaudio_instance.terminate()
             except Exception as e:
-                print(f"Error playing audio chunk: {e}")
-                if not self.is_paused:  # 如果不是暂停导致的错误，需要清理资源
-                    await self._cleanup()
+                logger.error("Error terminating PyAudio%s: %s", context, e)
+
+    def _quantize_into(self, audio_array, out):
+        """将 float32 音频裁剪到 [-1, 1] 后量化为 int16 写入 out"""
+        # 裁剪结果写入缓冲池中的临时数组，不修改调用方的数据
+        clipped = self.buffer_pool.acquire(audio_array.size)
+        np.clip(audio_array, -1.0, 1.0, out=clipped)
+        np.multiply(clipped, INT16_SCALE, out=out, casting='unsafe')
+        self.buffer_pool.release(clipped)
+
+    async def _enqueue_audio(self, audio_array, sample_rate):
+        """把音频量化后直接写入环形缓冲尾部，返回其 (起始, 结束) 帧位置；已停止时返回 None"""
+        if not isinstance(audio_array, np.ndarray):
+            audio_array = np.frombuffer(audio_array, dtype=np.float32)
+        audio_array = audio_array.reshape(-1)
+        if self._stream_rate not in (None, sample_rate):
+            # 采样率变化需要重开流，先让旧数据播完
+            await self._wait_played(self._queued_frames)
+        # 只在打开流时持锁，等待播放期间 pause/resume/stop 可随时执行
+        async with self._lock:
+            if self.is_stopped:
+                return None
+            # 初始化 PyAudio 实例和流（采样率不变时复用）
+            self._init_pyaudio(sample_rate)
+
+        capacity = self._ring.size
+        start = self._queued_frames
+        written = 0
+        while written < audio_array.size:
+            n = min(audio_array.size - written, capacity)
+            if self._queued_frames - self._played_frames + n > capacity:
+                # 环形缓冲空间不足，等回调腾出 n 帧
+                await self._wait_played(self._queued_frames + n - capacity)
+                if self.is_stopped:
+                    return None
+            tail = self._queued_frames % capacity
+            first = min(n, capacity - tail)
+            self._quantize_into(audio_array[written:written + first], self._ring[tail:tail + first])
+            if n > first:
+                self._quantize_into(audio_array[written + first:written + n], self._ring[:n - first])
+            # 数据写完后再推进尾位置，回调线程才会读取这段数据
+            self._queued_frames += n
+            written += n
+        return start, self._queued_frames
+
+    async def _wait_played(self, position):
+        """等待回调取走 position 之前的全部数据（停止时会被提前唤醒）"""
+        if self._played_frames >= position:
+            return
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        done = asyncio.Event()
+        self._waiters.append((position, done))
+        await done.wait()
 
     async def run_audio_player_loop(self, audio_queue):
-        """运行音频播放循环"""
+        """运行音频播放循环
+
+        当前块一开始播放就取下一块、转换并排到它后面，
+        使下一块的准备与当前块的播放重叠，块与块之间没有间隙。
+        """
+        self._loop_task = asyncio.current_task()
         try:
             while True:
                 if self.is_stopped:
-                    print("音频播放已停止")
+                    logger.debug("音频播放已停止")
                     break
 
-                async with self._lock:
-                    is_currently_paused = self.is_paused
-                
-                if is_currently_paused:
-                    await asyncio.sleep(0.1)
+                if self.is_paused:
+                    # 等待 resume()（stop 也会置位该事件），暂停期间不占用 CPU
+                    await self._resume_evt.wait()
                     continue
 
                 try:
-                    # 使用timeout来避免永久阻塞
-                    item = await asyncio.wait_for(audio_queue.get(), timeout=0.1)
-                except asyncio.TimeoutError:
-                    continue
+                    # 停止时由 stop_current_audio 取消本任务来打断等待
+                    item = await audio_queue.get()
                 except asyncio.CancelledError:
                     break
 
                 if item is None:
-                    print("音频队列中收到停止信号")
+                    logger.debug("音频队列中收到停止信号")
+                    # 播完已排队的数据再退出
+                    await self._wait_played(self._queued_frames)
                     break
 
                 audio_data, sample_rate, chunk = item
                 
                 try:
-                    # 更新UI显示当前朗读内容
-                    QMetaObject.invokeMethod(
-                        self.gui_instance,
-                        "highlight_paragraph",
-                        Qt.QueuedConnection,
-                        Q_ARG(str, chunk["text"]),
-                        Q_ARG(int, chunk["page"]),
-                    )
-
-                    # 再次检查是否暂停，避免在UI更新后播放
-                    async with self._lock:
-                        if self.is_paused or self.is_stopped:
-                            await audio_queue.put(item)  # 放回未播放的内容
-                            continue
-
-                    # 异步播放音频
-                    await self.play_audio_chunk_async(audio_data, sample_rate)
-                    
-                    # 完成后标记任务完成
-                    audio_queue.task_done()
+                    try:
+                        # 量化写入环形缓冲、排到正在播放的块之后，原始缓冲随即回收
+                        span = await self._enqueue_audio(audio_data, sample_rate)
+                    except Exception as e:
+                        # 输出设备不可用等错误，继续取块只会让上游白白合成，直接停止播放
+                        logger.error("Error playing audio chunk: %s", e)
+                        await self._cleanup()
+                        break
+                    self.buffer_pool.release(audio_data)
+                    if span is None:
+                        break
+
+                    # 等上一块播完（即本块开始播放）再更新界面
+                    await self._wait_played(span[0])
+                    if self.is_stopped:
+                        break
+
+                    # 更新UI显示当前朗读内容，与上一次相同时跳过跨线程调用
+                    highlight = (chunk["page"], chunk["text"])
+                    if highlight != self._last_highlight:
+                        self._last_highlight = highlight
+                        self.gui_instance.request_highlight(chunk["text"], chunk["page"])
                     
                 except Exception as e:
-                    print(f"处理音频块时出错: {e}")
-                    if not self.is_paused and not self.is_stopped:
-                        audio_queue.task_done()
+                    logger.error("处理音频块时出错: %s", e)
+                finally:
+                    audio_queue.task_done()
 
         except Exception as e:
-            print(f"音频播放循环出错: {e}")
+            logger.error("音频播放循环出错: %s", e)
         finally:
-            print("音频播放循环结束，清理资源")
+            logger.debug("音频播放循环结束，清理资源")
             await self._cleanup()  # 使用异步清理方法
 
     async def pause(self):
         """暂停播放"""
-        print("暂停音频播放")
-        async with self._lock:  # 使用锁来保护状态更改
-            self.is_paused = True
-            if not self.is_stopped:  # 只有在未停止时才尝试暂停流
-                current_stream = self.stream 
-                if current_stream:
-                    try:
-                        if current_stream.is_active():
-                            current_stream.stop_stream()
-                            print("Stream paused successfully.")
-                    except Exception as e:
-                        print(f"Error pausing stream: {e}")
+        logger.debug("暂停音频播放")
+        self._resume_evt.clear()
+        async with self._lock:  # 锁内只取流的快照
+            stream = self.stream if not self.is_stopped else None  # 只有在未停止时才尝试暂停流
+        # PortAudio 调用放在锁外，频繁暂停/恢复时不阻塞其他协程
+        if stream:
+            try:
+                if stream.is_active():
+                    stream.stop_stream()
+                    logger.debug("Stream paused successfully.")
+            except Exception as e:
+                logger.error("Error pausing stream: %s", e)
 
     async def resume(self):
         """恢复播放"""
-        print("恢复音频播放")
-        async with self._lock:  # 使用锁来保护状态更改
-            if not self.is_stopped:  # 只有在未停止时才恢复
-                self.is_paused = False
-                # 如果有暂停的流，尝试重新启动
-                current_stream = self.stream
-                if current_stream and not current_stream.is_active():
-                    try:
-                        current_stream.start_stream()
-                        print("Stream resumed successfully.")
-                    except Exception as e:
-                        print(f"Error resuming stream: {e}")
+        logger.debug("恢复音频播放")
+        async with self._lock:  # 锁内只更新状态并取流的快照
+            if self.is_stopped:  # 只有在未停止时才恢复
+                return
+            self._resume_evt.set()
+            stream = self.stream
+        # 如果有暂停的流，尝试重新启动
+        if stream and not stream.is_active():
+            try:
+                stream.start_stream()
+                logger.debug("Stream resumed successfully.")
+            except Exception as e:
+                logger.error("Error resuming stream: %s", e)
 
     async def _cleanup(self):
         """清理音频资源"""
-        async with self._lock:  # 使用锁来保护资源访问
-            if self.stream:
-                try:
-                    if self.stream.is_active():
-                        self.stream.stop_stream()
-                    self.stream.close()
-                except Exception as e:
-                    print(f"Error stopping stream during cleanup: {e}")
-                self.stream = None
-                
-            if self.pyaudio_instance:
-                try:
-                    self.pyaudio_instance.terminate()
-                except Exception as e:
-                    print(f"Error terminating PyAudio during cleanup: {e}")
-                self.pyaudio_instance = None
-                
-            self.is_stopped = True  # 确保设置停止状态
-            print("stop 1")
-            self.is_paused = False  # 重置暂停状态
-            
-            try:
-                if not self.executor._shutdown:
-                    self.executor.shutdown(wait=False)
-            except Exception as e:
-                print(f"Error shutting down executor: {e}")
+        await self._release_audio(" during cleanup")
+        self._stop_evt.set()  # 确保设置停止状态
+        logger.debug("音频资源已清理")
+        self._resume_evt.set()  # 重置暂停状态
 
     def update_current_page_display(self, text, page_num):
         self.text_display.setText(text)
@@ -1,20 +1,27 @@
 import sys
 import os
 import asyncio
+import bisect
+import hashlib
 import json
+import re
 import threading
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 import fitz
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QTextEdit, QPushButton, QVBoxLayout, QHBoxLayout, 
     QWidget, QLabel, QSpinBox, QFileDialog, QTreeView, QSplitter, QSizePolicy,
     QLineEdit, QDoubleSpinBox, QGroupBox, QMessageBox
 )
-from PyQt5.QtCore import Qt, QMetaObject, Q_ARG, QTimer, pyqtSlot
+from PyQt5.QtCore import Qt, QMetaObject, Q_ARG, QTimer, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import QBrush, QColor, QFont, QTextCharFormat, QTextCursor, QStandardItemModel, QStandardItem
-from pdf_utils import extract_text_chunks_from_range, get_pdf_outline
-from tts_utils import load_tts_resources, generate_audio_chunk, clean_text_for_tts
-from audio_player_utils import AudioPlayer
+from pdf_utils import (
+    extract_text_chunks_from_range, get_pdf_outline, extract_page_text, trim_mupdf_store
+)
+# tts_utils（PyTorch/F5-TTS）和 audio_player_utils（PyAudio）在首次用到时才导入，
+# 让界面先显示出来；页面提取子进程导入本模块时也不会加载它们
 
 # 获取资源目录的基路径
 if getattr(sys, 'frozen', False):
@@ -35,10 +42,84 @@ DEFAULT_LAST_PDF_PATH = ""
 DEFAULT_LAST_READ_PAGE = 0
 SETTINGS_FILE = os.path.join(base_path, 'data', 'autoreader_settings.json')
 TEXT_CHUNK_LENGTH = 50
+PAGE_PREFETCH = 3  # 预取当前页之后的页数
+PAGE_CACHE_SIZE = 32  # 页面文本缓存的最大页数
+SETTINGS_SAVE_DELAY_MS = 500  # 合并短时间内多次保存设置请求的延迟
+PIPELINE_QUEUE_SIZE = 2  # 朗读流水线各段之间队列的容量
+PAGE_HISTORY_SIZE = 256  # 最多记住最近打开的多少个PDF的页码
+TTS_CACHE_SIZE = 128  # 合成音频缓存的最大条数
+TTS_CACHE_MAX_TEXT = TEXT_CHUNK_LENGTH // 2  # 只缓存短于此长度的文本块（页眉、章节标题等常重复的内容）
+
+_NON_WS_RE = re.compile(r"\S+")
+
+def normalize_text(t):
+    """合并多余的空白字符，便于朗读文本与页面文本匹配"""
+    return ' '.join(t.split())
+
+def normalize_text_with_offsets(t):
+    """与 normalize_text 结果相同，并返回规范化文本中每个字符在原文中的位置"""
+    words = []
+    offsets = []
+    for m in _NON_WS_RE.finditer(t):
+        if words:
+            offsets.append(m.start() - 1)  # 合并后的空格对应原文中单词前的空白
+        words.append(m.group())
+        offsets.extend(range(m.start(), m.end()))
+    return ' '.join(words), offsets
+
+def build_outline_model(outline):
+    """根据 get_pdf_outline 的结果创建目录模型，返回 (模型, 按页码排序的 (0基页码, 目录项) 列表)"""
+    model = QStandardItemModel()
+    model.setHorizontalHeaderLabels(["目录"])
+
+    # 用于跟踪每个级别的最后一个项目
+    last_items = {}
+    # (0基页码, 目录项)，按页码排序后供高亮时二分查找
+    outline_index = []
+
+    for item in outline:
+        level = item['level']
+        # 在display_title后面添加页码信息
+        display_text = item['display_title']
+        if item['page'] is not None:
+            display_text += f"  ({item['page']})"
+        outline_item = QStandardItem(display_text)
+        outline_item.setData(item['page'], Qt.UserRole)
+        if item['page'] is not None and item['page'] >= 1:
+            outline_index.append((item['page'] - 1, outline_item))
+
+        # 确定父项
+        if level == 0:
+            model.appendRow(outline_item)
+        else:
+            parent_level = level - 1
+            if parent_level in last_items:
+                last_items[parent_level].appendRow(outline_item)
+            else:
+                # 如果没有找到父项，就添加到根级别
+                model.appendRow(outline_item)
+
+        last_items[level] = outline_item
+
+    # 稳定排序，同页的目录项保持目录中的先后顺序
+    outline_index.sort(key=lambda entry: entry[0])
+    return model, outline_index
 
 class AutoReaderApp(QMainWindow):
+    # 事件循环线程不能直接操作界面，通过信号排队到GUI线程执行
+    showError = pyqtSignal(str, str)
+    showWarning = pyqtSignal(str, str)
+    readingStarted = pyqtSignal()
+    readingStopped = pyqtSignal()
+    outlineReady = pyqtSignal(object, object, list)
+
     def __init__(self):
         super().__init__()
+        self.showError.connect(self._show_error)
+        self.showWarning.connect(self._show_warning)
+        self.readingStarted.connect(self._on_reading_started)
+        self.readingStopped.connect(self._on_reading_stopped)
+        self.outlineReady.connect(self._apply_outline_model)
         self.setWindowTitle("AutoReader 有声阅读器")
         self.setGeometry(200, 200, 1000, 700)
 
@@ -48,19 +129,65 @@ class AutoReaderApp(QMainWindow):
         self.pdf_outline = []
         self.current_chunk = ""
         self.is_reading = False
+        self._reader_task = None  # 当前 main_async_reader_loop 任务
         self.is_reading_paused = False
         self.currently_displayed_page_num_0_indexed = -1
-        self.stop_reading_flag = False # 用于停止朗读的布尔标志
+        self._page_plain_text = ""  # 当前页规范化后的纯文本，display_page 时生成
+        self._page_text_offsets = []  # _page_plain_text 中每个字符在文档中的位置
+        self._paragraph_offsets = {}  # 朗读段落文本 -> 在当前页中的位置
+        self._highlight_search_pos = 0  # 下一次查找的起点，朗读顺序推进时只需向后扫描
+        self._has_highlight = False  # 当前页面上是否有段落高亮
+        self._last_highlight_range = None  # 最近一次高亮的 (文档起点, 文档终点, 0基页码)
+        self._pending_highlight = None  # 等待GUI线程处理的 (文本, 页码)，只保留最新一个
+        self._highlight_lock = threading.Lock()
+        self._outline_pages = []  # 有效目录项的0基页码（升序）
+        self._outline_items = []  # 与 _outline_pages 一一对应的目录项
+        self._outline_highlight_idx = -1  # 当前高亮目录项在 _outline_items 中的下标
+        self.stop_event = asyncio.Event() # 朗读流水线的停止信号，跨线程用 _request_stop 设置
+        self.resume_event = asyncio.Event() # 未暂停时置位，暂停时清除
+        self.resume_event.set()
         self.shutdown_timer = QTimer(self)
         self.audio_player = None
+        self.text_q = asyncio.Queue()
         self.audio_queue = asyncio.Queue()
 
         # 添加事件循环和线程相关的属性
         self.loop = None
         self.thread = None
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        # TTS 推理只在一个 tts 线程中串行进行：每次合成都会重置 torch 的全局随机种子，
+        # 且 CPU 上单次推理已占满所有核心、CUDA 上各线程共用默认流，并发合成没有收益。
+        # 文件读写等轻量任务走独立线程池，不排在推理之后
+        self.tts_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        self.io_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="io")
         self.tts_resources_loaded = False
 
+        # 后续页面在独立进程中预取，结果按页码缓存（LRU），GUI 线程和朗读循环共用。
+        # 进程池在程序运行期间只建一个；显式使用 spawn，不在已有 Qt 和多个线程的进程中 fork
+        self.page_extractor = ProcessPoolExecutor(
+            max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+        self._page_cache = OrderedDict()  # 0基页码 -> Future[str]
+        self._page_cache_lock = threading.Lock()
+        self._page_source_path = None  # 预取任务读取的PDF路径
+        self._pdf_doc_lock = threading.Lock()  # 本进程内解析 self.pdf_doc 时持有
+        # 短文本块合成音频的LRU缓存：(文本, 语速, 参考音频) 的摘要 -> (audio_data, sample_rate)，
+        # 只在事件循环线程中读写
+        self._tts_cache = OrderedDict()
+        self._reading_speed = DEFAULT_SPEED  # 开始朗读时在GUI线程读取的语速和参考音频，朗读期间使用
+        self._reading_ref_audio = DEFAULT_REF_AUDIO_PATH
+
+        # 设置在内存中维护，保存请求经 _settings_timer 合并后再写盘
+        self._settings_dict = {}
+        self._settings_dirty = False
+        self._saved_settings_json = None  # 最近一次写盘的内容，未变化时跳过写入
+        self._settings_timer = QTimer(self)
+        self._settings_timer.setSingleShot(True)
+        self._settings_timer.timeout.connect(self._flush_settings)
+        # 后台写盘和退出前的同步写盘共用临时文件，用同一把锁串行；
+        # 按序号跳过比已写入内容更旧的快照
+        self._settings_file_lock = threading.Lock()
+        self._settings_seq = 0  # 最近一次生成的设置快照序号
+        self._settings_written_seq = 0  # 已写入文件的快照序号
+
         # 加载设置
         self.load_settings()
 
@@ -76,6 +203,9 @@ class AutoReaderApp(QMainWindow):
             QPushButton:pressed { background-color: #d0d0d0; }
             QPushButton:disabled { background-color: #e8e8e8; color: #a0a0a0; border-color: #d8d8d8; } /* 禁用状态 */
         """
+        # 目录高亮用的画刷，创建一次反复使用
+        self._brush_hl = QBrush(QColor("#D3D3D3"))
+        self._brush_clear = QBrush(Qt.transparent)
         
         # 初始化异步运行环境
         self._init_async_environment()
@@ -90,14 +220,27 @@ class AutoReaderApp(QMainWindow):
             asyncio.set_event_loop(loop)
             loop.run_forever()
             
-        self.loop = asyncio.new_event_loop()
+        self.loop = None
+        if sys.platform != "win32":
+            # 有 uvloop 时使用它，队列与线程池往返的开销更低；未安装则退回标准事件循环
+            try:
+                import uvloop
+                self.loop = uvloop.new_event_loop()
+            except ImportError:
+                pass
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+        # 未指定线程池的 run_in_executor / to_thread 调用统一走 io_executor
+        self.loop.set_default_executor(self.io_executor)
         self.thread = threading.Thread(target=run_event_loop, args=(self.loop,), daemon=True)
         self.thread.start()
         
     def init_ui(self):
         # 主布局
         main_widget = QWidget()
-        main_widget.setStyleSheet("QWidget { background-color: #FAFAFA; }") # 设置主背景色
+        # 设置主背景色，并在同一张样式表中统一设置所有按钮的样式：只解析一次，
+        # 按钮规则写在后面，同等优先级下覆盖 QWidget 的背景色
+        main_widget.setStyleSheet("QWidget { background-color: #FAFAFA; }" + self.standard_button_style)
         self.setCentralWidget(main_widget)
         self.main_v_layout = QVBoxLayout(main_widget) # Renamed for clarity
         self.main_v_layout.setSpacing(4)  # 优化主要UI块之间的垂直间距
@@ -111,13 +254,11 @@ class AutoReaderApp(QMainWindow):
         settings_button = QPushButton("设置")
         settings_button.setFixedSize(80, 30)  # 细长边框
         settings_button.clicked.connect(self.toggle_settings_visibility)
-        settings_button.setStyleSheet(self.standard_button_style)
         
         # 文件选择按钮
         self.load_button = QPushButton("打开 PDF")
         self.load_button.setFixedSize(80, 30)
         self.load_button.clicked.connect(self.load_pdf) # 连接“打开PDF”按钮到load_pdf方法
-        self.load_button.setStyleSheet(self.standard_button_style)
         
         # 文件路径标签
         self.file_path_label = QLabel("未选择文件")
@@ -152,11 +293,13 @@ class AutoReaderApp(QMainWindow):
                 height: 24px;
             }
         """)
+        self.outline_view.clicked.connect(self.outline_item_clicked)
         content_splitter.addWidget(self.outline_view)
         
         # 右侧：文本显示
         self.text_display = QTextEdit()
         self.text_display.setReadOnly(True)
+        self.text_display.document().setUndoRedoEnabled(False)  # 只读显示，不需要撤销历史
         self.text_display.setStyleSheet("""
             QTextEdit {
                 background-color: white;
@@ -190,17 +333,13 @@ class AutoReaderApp(QMainWindow):
 
         self.prev_page_button = QPushButton("上一页")
         self.prev_page_button.setFixedSize(80, 30)
-        self.prev_page_button.setStyleSheet(self.standard_button_style)
         self.prev_page_button.clicked.connect(self.goto_prev_page)
 
         self.next_page_button = QPushButton("下一页")
         self.next_page_button.setFixedSize(80, 30)
-        self.next_page_button.setStyleSheet(self.standard_button_style)
         self.next_page_button.clicked.connect(self.goto_next_page)
 
         # 设置按钮样式
-        self.start_button.setStyleSheet(self.standard_button_style)
-        self.pause_button.setStyleSheet(self.standard_button_style)
         
         # Modify the connection for the start button
         self.start_button.clicked.connect(self.on_start_reading_clicked)
@@ -227,7 +366,6 @@ class AutoReaderApp(QMainWindow):
         self.model_path_input = QLineEdit(self.tts_model_path)
         model_browse = QPushButton("浏览")
         model_browse.clicked.connect(lambda: self.browse_file(self.model_path_input))
-        model_browse.setStyleSheet(self.standard_button_style)
         model_layout.setSpacing(5)
         model_layout.addWidget(model_label)
         model_layout.addWidget(self.model_path_input)
@@ -240,7 +378,6 @@ class AutoReaderApp(QMainWindow):
         self.vocab_path_input = QLineEdit(self.tts_vocab_path)
         vocab_browse = QPushButton("浏览")
         vocab_browse.clicked.connect(lambda: self.browse_file(self.vocab_path_input))
-        vocab_browse.setStyleSheet(self.standard_button_style)
         vocab_layout.setSpacing(5)
         vocab_layout.addWidget(vocab_label)
         vocab_layout.addWidget(self.vocab_path_input)
@@ -253,7 +390,6 @@ class AutoReaderApp(QMainWindow):
         self.ref_audio_path_input = QLineEdit(self.ref_audio_path)
         ref_audio_browse = QPushButton("浏览")
         ref_audio_browse.clicked.connect(lambda: self.browse_file(self.ref_audio_path_input))
-        ref_audio_browse.setStyleSheet(self.standard_button_style)
         ref_audio_layout.setSpacing(5)
         ref_audio_layout.addWidget(ref_audio_label)
         ref_audio_layout.addWidget(self.ref_audio_path_input)
@@ -280,10 +416,8 @@ class AutoReaderApp(QMainWindow):
         self.shutdown_spinbox.setSuffix(" 分钟")
         self.shutdown_button = QPushButton("定时关机")
         self.shutdown_button.clicked.connect(self.start_shutdown_timer)
-        self.shutdown_button.setStyleSheet(self.standard_button_style)
         self.cancel_shutdown_button = QPushButton("取消定时")
         self.cancel_shutdown_button.clicked.connect(self.cancel_shutdown_timer)
-        self.cancel_shutdown_button.setStyleSheet(self.standard_button_style)
         shutdown_layout.setSpacing(5)
         shutdown_layout.addWidget(self.shutdown_spinbox)
         shutdown_layout.addWidget(self.shutdown_button)
@@ -294,7 +428,6 @@ class AutoReaderApp(QMainWindow):
         # 修改保存设置按钮的文本
         save_button = QPushButton("保存设置并重新加载TTS资源")
         save_button.clicked.connect(self.save_and_reload)
-        save_button.setStyleSheet(self.standard_button_style)
         settings_layout.addWidget(save_button)
         
         settings_layout.addStretch()
@@ -322,6 +455,7 @@ class AutoReaderApp(QMainWindow):
     def execute_shutdown(self):
         # 保存当前状态
         self.save_settings()
+        self._flush_settings(blocking=True)
         # 执行关机命令
         os.system("shutdown /s /t 60")  # 60秒后关机
         QMessageBox.information(self, "关机提示", "系统将在1分钟后关机")
@@ -354,12 +488,16 @@ class AutoReaderApp(QMainWindow):
         try:
             with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
                 settings = json.load(f)
+                self._settings_dict = settings
                 self.tts_model_path = settings.get("tts_model_path", DEFAULT_TTS_MODEL_PATH)
                 self.tts_vocab_path = settings.get("vocab_path", DEFAULT_TTS_VOCAB_PATH) # 确保键名一致
                 self.ref_audio_path = settings.get("ref_audio_path", DEFAULT_REF_AUDIO_PATH)
                 self.tts_speed = settings.get("speed", DEFAULT_SPEED)
                 # 加载PDF页码历史字典
-                self.pdf_page_history = settings.get("pdf_page_history", {}) # 新增：加载页码历史字典
+                history = settings.get("pdf_page_history")
+                # 按最近使用排序（最新的在末尾），与设置字典共用同一对象
+                self.pdf_page_history = OrderedDict(history if isinstance(history, dict) else {})
+                settings["pdf_page_history"] = self.pdf_page_history
                 # 保留 last_pdf_path 用于应用启动时自动加载，其页码将从 pdf_page_history 中获取
                 self.last_pdf_path = settings.get("last_pdf_path", DEFAULT_LAST_PDF_PATH)
 
@@ -370,7 +508,8 @@ class AutoReaderApp(QMainWindow):
             self.tts_vocab_path = DEFAULT_TTS_VOCAB_PATH
             self.ref_audio_path = DEFAULT_REF_AUDIO_PATH
             self.tts_speed = DEFAULT_SPEED
-            self.pdf_page_history = {} # 新增：初始化为空字典
+            self.pdf_page_history = OrderedDict()
+            self._settings_dict = {"pdf_page_history": self.pdf_page_history}
             self.last_pdf_path = DEFAULT_LAST_PDF_PATH
 
         except Exception as e:
@@ -380,56 +519,95 @@ class AutoReaderApp(QMainWindow):
             self.tts_vocab_path = DEFAULT_TTS_VOCAB_PATH
             self.ref_audio_path = DEFAULT_REF_AUDIO_PATH
             self.tts_speed = DEFAULT_SPEED
-            self.pdf_page_history = {} # 新增：初始化为空字典
+            self.pdf_page_history = OrderedDict()
+            self._settings_dict = {"pdf_page_history": self.pdf_page_history}
             self.last_pdf_path = DEFAULT_LAST_PDF_PATH
 
     def save_settings(self):
-        """保存设置,包括TTS设置和PDF页码历史"""
-        try:
-            # 读取现有设置，以便更新页码历史而不是完全覆盖
-            try:
-                with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
-                    settings = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                settings = {}
-
-            # 更新TTS设置
-            settings["tts_model_path"] = self.model_path_input.text()
-            settings["vocab_path"] = self.vocab_path_input.text()
-            settings["ref_audio_path"] = self.ref_audio_path_input.text()
-            settings["speed"] = self.speed_input.value()
-
-            # 更新当前PDF的页码历史
-            if self.pdf_path:
-                # 确保 pdf_page_history 存在且是字典
-                if "pdf_page_history" not in settings or not isinstance(settings["pdf_page_history"], dict):
-                    settings["pdf_page_history"] = {}
-                settings["pdf_page_history"][self.pdf_path] = self.currently_displayed_page_num_0_indexed
-                # 同时更新 last_pdf_path 为当前文件路径
-                settings["last_pdf_path"] = self.pdf_path
-            else:  # 如果没有打开的PDF，则不更新页码历史和last_pdf_path
-                pass # 或者可以选择清空 last_pdf_path: settings["last_pdf_path"] = DEFAULT_LAST_PDF_PATH
-
-            with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-                json.dump(settings, f, ensure_ascii=False, indent=2)
-
-            # 更新内部状态 (可选，因为下次加载会重新读取)
-            # self.tts_model_path = settings["tts_model_path"]
-            # self.tts_vocab_path = settings["vocab_path"]
-            # self.ref_audio_path = settings["ref_audio_path"]
-            # self.tts_speed = settings["speed"]
-            # self.pdf_page_history = settings["pdf_page_history"]
-            # self.last_pdf_path = settings["last_pdf_path"]
+        """保存设置,包括TTS设置和PDF页码历史
 
+        先同步更新内存中的设置，写盘由定时器延迟执行，多次请求合并为一次写入。
+        """
+        settings = self._settings_dict
+
+        # 更新TTS设置
+        settings["tts_model_path"] = self.model_path_input.text()
+        settings["vocab_path"] = self.vocab_path_input.text()
+        settings["ref_audio_path"] = self.ref_audio_path_input.text()
+        settings["speed"] = self.speed_input.value()
+
+        # 更新当前PDF的页码历史
+        if self.pdf_path:
+            history = self.pdf_page_history
+            history[self.pdf_path] = self.currently_displayed_page_num_0_indexed
+            history.move_to_end(self.pdf_path)
+            while len(history) > PAGE_HISTORY_SIZE:
+                history.popitem(last=False)
+            # 同时更新 last_pdf_path 为当前文件路径
+            settings["last_pdf_path"] = self.pdf_path
+
+        self._settings_dirty = True
+        if not self._settings_timer.isActive():
+            self._settings_timer.start(SETTINGS_SAVE_DELAY_MS)
+        return True
+
+    def _flush_settings(self, blocking=False):
+        """把内存中的设置写入文件
+
+        在GUI线程中序列化出一致的快照，写盘交给事件循环在线程池中完成；
+        blocking=True 时（如退出前）直接在当前线程写入。
+        """
+        self._settings_timer.stop()
+        if not self._settings_dirty:
             return True
+        try:
+            data = json.dumps(self._settings_dict, ensure_ascii=False, indent=2)
+        except Exception as e:
+            QMessageBox.critical(self, "保存设置错误", f"保存设置时发生错误: {str(e)}")
+            return False
+        self._settings_dirty = False
+        if data == self._saved_settings_json:
+            return True
+        self._saved_settings_json = data
+        self._settings_seq += 1
+        seq = self._settings_seq
 
+        if not blocking and self.loop and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.save_settings_async(data, seq), self.loop)
+            return True
+        try:
+            self._save_settings_sync(data, seq)
+            return True
         except Exception as e:
+            self._saved_settings_json = None
             QMessageBox.critical(self, "保存设置错误", f"保存设置时发生错误: {str(e)}")
             return False
 
+    async def save_settings_async(self, data, seq):
+        """在 io_executor 中写入设置文件，不阻塞GUI线程"""
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self.io_executor, self._save_settings_sync, data, seq
+            )
+        except Exception as e:
+            self._saved_settings_json = None  # 写入失败，下次保存时重试
+            print(f"保存设置时发生错误: {e}")
+
+    def _save_settings_sync(self, data, seq):
+        """先写临时文件再替换，避免写到一半留下损坏的设置文件"""
+        with self._settings_file_lock:
+            if seq <= self._settings_written_seq:
+                return  # 已写入更新的设置
+            tmp_path = SETTINGS_FILE + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_path, SETTINGS_FILE)
+            self._settings_written_seq = seq
+
     def reload_tts_resources(self):
         """重新加载TTS资源"""
         try:
+            from tts_utils import load_tts_resources, warmup_tts
             success = load_tts_resources(
                 self.model_path_input.text(),
                 self.vocab_path_input.text(),
@@ -439,14 +617,22 @@ class AutoReaderApp(QMainWindow):
                 None
             )
             self.tts_resources_loaded = success
+            # 模型或参考音频可能已变化，旧的合成结果不再可用；缓存只在事件循环线程中修改
+            if self.loop and self.loop.is_running():
+                self.loop.call_soon_threadsafe(self._tts_cache.clear)
+            else:
+                self._tts_cache.clear()
             
-            if not success:
-                QMessageBox.warning(self, "加载警告", "TTS资源加载失败,请检查设置和文件路径")
+            if success:
+                # 预热放到合成所用的 tts 线程中，不阻塞调用方（GUI线程或朗读循环）
+                self.tts_executor.submit(warmup_tts)
+            else:
+                self.showWarning.emit("加载警告", "TTS资源加载失败,请检查设置和文件路径")
                 
             return success
             
         except Exception as e:
-            QMessageBox.critical(self, "加载错误", f"加载TTS资源时发生错误: {str(e)}")
+            self.showError.emit("加载错误", f"加载TTS资源时发生错误: {str(e)}")
             return False
 
     def save_and_reload(self):
@@ -461,7 +647,7 @@ class AutoReaderApp(QMainWindow):
             # 保存当前PDF的页码历史
             self.save_settings()
             # 退出朗读
-            self.stop_reading_flag = True
+            self._request_stop()
             self.pdf_path = file_path
             # 尝试从历史记录中获取上次阅读的页码
             last_page = self.pdf_page_history.get(file_path, DEFAULT_LAST_READ_PAGE)
@@ -488,23 +674,83 @@ class AutoReaderApp(QMainWindow):
                 self.audio_player = None
 
             # 重置状态
-            self.stop_reading_flag = True
+            self.stop_event.set()
             self.is_reading_paused = False
-            self.pause_button.setText("暂停")
-            self.pause_button.setEnabled(False)
-            
-            # 清除高亮
-            self.clear_all_highlights()
-            
-            # 等待所有任务完成
-            await asyncio.sleep(0.1)
+            self.resume_event.set()
             
         except Exception as e:
             print(f"清理资源时出错: {e}")
 
+    def _reset_page_cache(self, path):
+        """打开新的PDF后清空页面缓存，之后的预取任务改为读取 path"""
+        with self._page_cache_lock:
+            for future in self._page_cache.values():
+                future.cancel()
+            self._page_cache.clear()
+            self._page_source_path = path
+
+    def _page_text_future(self, page_num):
+        """返回页面文本的 Future（命中缓存时直接复用），同时预取其后的几页"""
+        last_page = min(page_num + PAGE_PREFETCH, self.pdf_doc.page_count - 1)
+        with self._page_cache_lock:
+            for p in range(page_num, last_page + 1):
+                if p not in self._page_cache:
+                    self._page_cache[p] = self.page_extractor.submit(
+                        extract_page_text, self._page_source_path, p)
+            # 请求页最后移到末尾，淘汰时最晚被淘汰
+            for p in range(last_page, page_num - 1, -1):
+                self._page_cache.move_to_end(p)
+            while len(self._page_cache) > PAGE_CACHE_SIZE:
+                self._page_cache.popitem(last=False)
+            return self._page_cache[page_num]
+
+    def _extract_page_in_process(self, page_num):
+        """在本进程中直接解析页面文本，并以完成的 Future 存入缓存"""
+        with self._pdf_doc_lock:
+            if self.pdf_doc is None:
+                raise RuntimeError("PDF文档已关闭")
+            text = self.pdf_doc.load_page(page_num).get_text("text")
+        done = Future()
+        done.set_result(text)
+        with self._page_cache_lock:
+            self._page_cache[page_num] = done
+        return text
+
+    async def _load_page_text(self, page_num):
+        """朗读循环读取页面文本：等待预取结果，失败时与 _get_page_text 一样在本进程中解析"""
+        try:
+            return await asyncio.wrap_future(self._page_text_future(page_num))
+        except Exception as e:
+            print(f"预取页面 {page_num + 1} 失败，直接解析: {e}")
+            return await asyncio.get_running_loop().run_in_executor(
+                self.io_executor, self._extract_page_in_process, page_num)
+
+    def _get_page_text(self, page_num):
+        """同步获取页面文本：已预取完成时直接使用，否则在本进程中解析，不等待进程池"""
+        with self._page_cache_lock:
+            future = self._page_cache.get(page_num)
+        if future is not None and future.done() and not future.cancelled() and future.exception() is None:
+            text = future.result()
+        else:
+            text = self._extract_page_in_process(page_num)
+        # 只把后续几页交给进程池
+        if page_num + 1 < self.pdf_doc.page_count:
+            try:
+                self._page_text_future(page_num + 1)
+            except Exception as e:
+                print(f"预取页面 {page_num + 2} 失败: {e}")
+        return text
+
     def load_pdf_content(self, path, initial_page=0):
         try:
-            self.pdf_doc = fitz.open(path)
+            new_doc = fitz.open(path)
+            # 关闭上一个文档，释放其占用的 MuPDF 资源
+            with self._pdf_doc_lock:
+                old_doc, self.pdf_doc = self.pdf_doc, new_doc
+                if old_doc:
+                    old_doc.close()
+                    trim_mupdf_store()
+            self._reset_page_cache(path)
             self.pdf_outline = get_pdf_outline(self.pdf_doc)
             self.update_outline_view()
             # 确定要显示的起始页码
@@ -526,11 +772,19 @@ class AutoReaderApp(QMainWindow):
 
     def display_page(self, page_num):
         if self.pdf_doc and page_num < self.pdf_doc.page_count:
-            page = self.pdf_doc.load_page(page_num)
-            text = page.get_text("text")
+            text = self._get_page_text(page_num)
             self.clear_all_highlights()
-            self.text_display.setText(text)
+            # 按纯文本设置，跳过富文本解析；期间暂停重绘，只做一次布局
+            self.text_display.setUpdatesEnabled(False)
+            self.text_display.setPlainText(text)
+            self.text_display.setUpdatesEnabled(True)
+            self._has_highlight = False
+            self._last_highlight_range = None
             self.currently_displayed_page_num_0_indexed = page_num
+            # 每页只取一次纯文本，高亮时直接在缓存上查找
+            self._page_plain_text, self._page_text_offsets = normalize_text_with_offsets(text)
+            self._paragraph_offsets = {}
+            self._highlight_search_pos = 0
             
             # 更新页码显示
             self.page_info_label.setText(f"第 {page_num + 1} / {self.pdf_doc.page_count} 页")
@@ -541,114 +795,30 @@ class AutoReaderApp(QMainWindow):
     def _highlight_current_outline_item(self, current_page_num):
         """根据当前页码高亮目录视图中对应的章节项"""
         print(f"_highlight_current_outline_item called for page: {current_page_num}") # Debug print
-        model = self.outline_view.model()
-        if not model:
+        if not self.outline_view.model():
             print("No outline model found.") # Debug print
             return
 
-        # 1. 查找与当前页码最匹配的目录项（页码 <= 当前页码，且页码最大）
-        best_match_item = None
-        best_match_page = -1 # 0-indexed page number
-
-        # 递归查找最佳匹配项
-        def find_best_match(parent_item, current_best_item, current_best_page):
-            if isinstance(parent_item, QStandardItemModel):
-                rows = parent_item.rowCount()
-                get_child = lambda r: parent_item.item(r)
-            else:
-                rows = parent_item.rowCount()
-                get_child = lambda r: parent_item.child(r)
-
-            for row in range(rows):
-                item = get_child(row)
-                if not item:
-                    continue
-
-                page_data = item.data(Qt.UserRole)
-                if page_data is not None:
-                    item_page_num_0_indexed = page_data - 1
-                    if item_page_num_0_indexed >= 0 and item_page_num_0_indexed <= current_page_num:
-                        if item_page_num_0_indexed > current_best_page:
-                            current_best_page = item_page_num_0_indexed
-                            current_best_item = item
-
-                # 递归搜索子项
-                current_best_item, current_best_page = find_best_match(item, current_best_item, current_best_page)
-
-            return current_best_item, current_best_page
-
-        best_match_item, best_match_page = find_best_match(model, best_match_item, best_match_page)
-
-        if best_match_item:
-            print(f"Best match found: '{best_match_item.text()}' on page {best_match_page + 1}") # Debug print
-        else:
-            print("No best match item found.") # Debug print
-
-        # 2. 遍历所有目录项，只高亮最佳匹配项
-        # 使用非递归方式遍历所有item并设置颜色
-        items_to_process = [model.item(r) for r in range(model.rowCount())]
-        while items_to_process:
-            item = items_to_process.pop(0)
-            if not item:
-                continue
-
-            item_page_data = item.data(Qt.UserRole)
-            item_page_str = f" (Page: {item_page_data})" if item_page_data is not None else ""
-            # print(f"Processing item: '{item.text()}'{item_page_str}") # Debug print
+        # 查找与当前页码最匹配的目录项（页码 <= 当前页码，且页码最大；同页取目录中靠前的一项）
+        idx = bisect.bisect_right(self._outline_pages, current_page_num) - 1
+        if idx >= 0:
+            idx = bisect.bisect_left(self._outline_pages, self._outline_pages[idx])
+        if idx == self._outline_highlight_idx:
+            return
 
-            if item is best_match_item:
-                # print(f"  -> Setting '{item.text()}' to GREY") # Debug print
-                item.setBackground(QBrush(QColor("#D3D3D3")))
-            else:
-                # print(f"  -> Setting '{item.text()}' to TRANSPARENT") # Debug print
-                item.setBackground(QBrush(Qt.transparent))
-
-            # 将子项添加到待处理列表
-            for r in range(item.rowCount()):
-                child_item = item.child(r)
-                if child_item:
-                    items_to_process.append(child_item)
-
-        # apply_colors(model, best_match_item) # 移除递归调用
-
-    def _clear_outline_highlights(self, parent_item):
-        """递归清除所有目录项的背景高亮"""
-        if isinstance(parent_item, QStandardItemModel):
-            rows = parent_item.rowCount()
-            get_child = lambda r: parent_item.item(r)
-        else:
-            rows = parent_item.rowCount()
-            get_child = lambda r: parent_item.child(r)
-
-        for row in range(rows):
-            item = get_child(row)
-            if item:
-                item.setBackground(QBrush(Qt.transparent))
-                # 递归清除子项高亮
-                self._clear_outline_highlights(item)
-
-    def _update_outline_item_color(self, item, current_page_num):
-        # 递归更新子项目的颜色
-        for row in range(item.rowCount()):
-            child_item = item.child(row)
-            if child_item:
-                self._update_outline_item_color(child_item, current_page_num)
-
-        # 更新当前项目的颜色
-        page_data = item.data(Qt.UserRole)
-        if page_data is not None:
-            item_page_num_0_indexed = page_data - 1
-            if item_page_num_0_indexed >= 0:
-                if item_page_num_0_indexed <= current_page_num:
-                    # 设置背景颜色为灰色
-                    item.setBackground(QBrush(QColor("#D3D3D3")))
-                else:
-                    # 设置背景颜色为透明
-                    item.setBackground(QBrush(Qt.transparent))
+        # 只需重绘旧的和新的高亮项
+        if self._outline_highlight_idx >= 0:
+            self._outline_items[self._outline_highlight_idx].setBackground(self._brush_clear)
+        if idx >= 0:
+            self._outline_items[idx].setBackground(self._brush_hl)
+        self._outline_highlight_idx = idx
 
     def on_start_reading_clicked(self):
         """Handle start button click to start reading in the correct loop."""
         if self.loop and self.loop.is_running():
+            # 控件只在GUI线程中读取
+            self._reading_speed = self.speed_input.value()
+            self._reading_ref_audio = self.ref_audio_path_input.text()
             asyncio.run_coroutine_threadsafe(self.start_reading(), self.loop)
         else:
             print("Event loop not running, cannot start reading.")
@@ -658,24 +828,26 @@ class AutoReaderApp(QMainWindow):
         print(f"起始页: {start_page}, 结束页: {end_page}")
         print(f"self.is_reading: {self.is_reading}")
 
-        if self.is_reading:
+        if self._reader_task and not self._reader_task.done():
             print("已有朗读任务，等待其退出...")
-            self.stop_reading_flag = True
+            self.stop_event.set()
             # 等待主循环退出
-            while self.is_reading:
-                await asyncio.sleep(0.1)
+            try:
+                await self._reader_task
+            except asyncio.CancelledError:
+                pass
             print("上一个朗读任务已退出")
 
         if not self.pdf_doc:
-            QMessageBox.warning(self, "警告", "请先加载一个PDF文件")
+            self.showWarning.emit("警告", "请先加载一个PDF文件")
             return
 
         self.is_reading = True
         print(f"=========> start_reading is_reading:{self.is_reading}")
-        self.stop_reading_flag = False
+        self.stop_event.clear()
         self.is_reading_paused = False
-        self.start_button.setDisabled(True)
-        self.pause_button.setDisabled(False)
+        self.resume_event.set()
+        self.readingStarted.emit()
 
         print("音频队列已清空并重新创建")
 
@@ -686,92 +858,165 @@ class AutoReaderApp(QMainWindow):
             current_page = 0
 
         print(f"实际朗读起始页: {current_page}, 结束页: {_end_page}")
-        asyncio.create_task(
+        self._reader_task = asyncio.create_task(
             self.main_async_reader_loop(current_page, _end_page)
         )
         print(f"main_async_reader_loop 已调度")
 
 
     async def main_async_reader_loop(self, start_page, _end_page): # _end_page 未使用，改为读取整个文档
-        """主异步朗读循环"""
-        print(f"开始新的朗读循环, stop_reading_flag 状态: {self.stop_reading_flag}") # 调试打印 (布尔值)
+        """主异步朗读循环：PDF文本 -> TTS -> 播放 三段流水线"""
+        print(f"开始新的朗读循环, stop_event 状态: {self.stop_event.is_set()}")
         try:
             # 确保TTS资源已加载
             if not self.tts_resources_loaded:
                 if not self.reload_tts_resources():
                     return
 
-            # 启动音频播放器
-            if not self.audio_player:
-                self.audio_player = AudioPlayer(self)
-                asyncio.create_task(
-                    self.audio_player.run_audio_player_loop(self.audio_queue)
-                )
+            # 每段之间用有界队列衔接，队列满时上游自然阻塞
+            self.text_q = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            self.audio_queue = asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+            from audio_player_utils import AudioPlayer
+            self.audio_player = AudioPlayer(self)
+
+            stages = [
+                asyncio.create_task(self._producer(start_page)),
+                asyncio.create_task(self._tts_worker()),
+                asyncio.create_task(self.audio_player.run_audio_player_loop(self.audio_queue)),
+            ]
+            stop_waiter = asyncio.create_task(self.stop_event.wait())
+            try:
+                # 三段全部完成、任一段出错或收到停止信号时退出
+                pending = set(stages)
+                while pending:
+                    done, pending = await asyncio.wait(pending | {stop_waiter},
+                                                       return_when=asyncio.FIRST_COMPLETED)
+                    if stop_waiter in done:
+                        print("stop_event set, 朗读循环提前结束")
+                        break
+                    pending.discard(stop_waiter)
+                    for task in done:
+                        if not task.cancelled() and task.exception():
+                            raise task.exception()
+                    if stages[2] in done:
+                        # 播放器已退出（读完或播放出错），上游不必再继续
+                        break
+            finally:
+                stop_waiter.cancel()
+                for task in stages:
+                    task.cancel()
+                await asyncio.gather(*stages, return_exceptions=True)
 
-            # 设置最大队列大小
-            MAX_QUEUE_SIZE = 2
-
-            # 异步生成并处理文本块
-            async for chunk in extract_text_chunks_from_range(
-                self.pdf_doc,
-                start_page,
-                self.pdf_doc.page_count - 1, # 朗读到文档末尾
-                chunk_length=50,
-                stop_reading_flag=self.stop_reading_flag,
-                text_cleaner_func=clean_text_for_tts
-            ):
-                if self.stop_reading_flag: # 检查停止标志 (布尔值)
-                    print("stop_reading_flag set, 朗读循环提前结束")
-                    break
-                print(f"=====主异步朗读循环=====")
-                while self.is_reading_paused and not self.stop_reading_flag:
-                    self.start_button.setEnabled(True) # 当朗读暂停时，重新启用开始朗读按钮
-                    await asyncio.sleep(0.1)
-
-                # 等待队列大小降到限制以下
-                while self.audio_queue.qsize() >= MAX_QUEUE_SIZE and not self.stop_reading_flag:
-                    if self.is_reading_paused:
-                        self.start_button.setEnabled(True) # 当朗读暂停时，重新启用开始朗读按钮
-                    await asyncio.sleep(0.1)
-
-                if self.stop_reading_flag:
-                    print("Reading stopped by pause")
-                    break # 如果停止标志被设置，退出循环
-                    
-                try:
-                    # 异步生成音频
-                    print("准备生成音频")
-                    audio_data, sample_rate = await asyncio.get_event_loop().run_in_executor(
-                        self.executor,
-                        generate_audio_chunk,
-                        chunk["tts_text"],
-                        self.speed_input.value()
-                    )
-                    print("生成音频完成")
-                    # 放入队列等待播放
-                    await self.audio_queue.put((audio_data, sample_rate, chunk))
-                    print(f"当前队列大小: {self.audio_queue.qsize()}")
-                    
-                except Exception as e:
-                    print(f"生成音频时出错: {e}")
-                    continue
-                
             #等待资源清理完成
             await self.cleanup_resources()
             print(f"=====主异步朗读循环退出=====")
 
         except Exception as e:
             print(f"朗读循环出错: {e}")
+            await self.cleanup_resources()
         finally:
             self.is_reading = False
             print(f"=========> 朗读循环退出 is_reading:{self.is_reading}")
-            self.start_button.setEnabled(True) # 重新启用开始朗读按钮
-            self.pause_button.setEnabled(False) # 禁用暂停按钮
-            self.pause_button.setText("暂停")
+            self.readingStopped.emit()
+
+    async def _producer(self, start_page):
+        """流水线第一段：从PDF提取文本块放入 text_q，结束时放入 None"""
+        from tts_utils import clean_text_for_tts
+        async for chunk in extract_text_chunks_from_range(
+            self.pdf_doc,
+            start_page,
+            self.pdf_doc.page_count - 1, # 朗读到文档末尾
+            chunk_length=50,
+            stop_reading_flag=self.stop_event,
+            text_cleaner_func=clean_text_for_tts,
+            page_text_loader=self._load_page_text
+        ):
+            # 暂停时在此挂起，直到继续或被取消
+            await self.resume_event.wait()
+            await self.text_q.put(chunk)
+        await self.text_q.put(None)
+
+    async def _tts_worker(self):
+        """流水线第二段：依次合成 text_q 中的文本块放入 audio_queue，与播放重叠进行"""
+        from tts_utils import generate_audio_chunk, adaptive_nfe_steps
+        buffer_pool = self.audio_player.buffer_pool
+
+        def tts_func(text, speed):
+            # 短于半个标准文本块的短句（标题、页眉等）用较少的扩散步数
+            nfe_steps = adaptive_nfe_steps(text, TEXT_CHUNK_LENGTH // 2)
+            return generate_audio_chunk(text, speed, nfe_steps_override=nfe_steps, buffer_pool=buffer_pool)
+
+        while True:
+            chunk = await self.text_q.get()
+            if chunk is None:
+                await self.audio_queue.put(None)
+                return
+            try:
+                audio_data, sample_rate = await self._synthesize(tts_func, chunk["tts_text"], self._reading_speed)
+            except Exception as e:
+                print(f"生成音频时出错: {e}")
+                continue
+            await self.audio_queue.put((audio_data, sample_rate, chunk))
+
+    async def _synthesize(self, tts_func, text, speed):
+        """合成一个文本块，命中缓存时跳过推理"""
+        key = hashlib.blake2b(
+            f"{text}|{speed}|{self._reading_ref_audio}".encode(),
+            digest_size=16,
+        ).digest()
+        cached = self._tts_cache.get(key)
+        if cached is not None:
+            # 页眉、章节标题等重复文本直接复用，跳过推理
+            self._tts_cache.move_to_end(key)
+            return cached
+        audio_data, sample_rate = await asyncio.get_running_loop().run_in_executor(
+            self.tts_executor, tts_func, text, speed
+        )
+        if len(text) < TTS_CACHE_MAX_TEXT:
+            # 缓存独立的只读副本：返回的缓冲仍由播放器归还到缓冲池，缓存项不会被复用改写
+            cached = audio_data.copy()
+            cached.flags.writeable = False
+            self._tts_cache[key] = (cached, sample_rate)
+            if len(self._tts_cache) > TTS_CACHE_SIZE:
+                self._tts_cache.popitem(last=False)
+        return audio_data, sample_rate
+
+    def _request_stop(self):
+        """从任意线程请求停止当前朗读"""
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+
+    @pyqtSlot(str, str)
+    def _show_error(self, title, msg):
+        QMessageBox.critical(self, title, msg)
+
+    @pyqtSlot(str, str)
+    def _show_warning(self, title, msg):
+        QMessageBox.warning(self, title, msg)
+
+    @pyqtSlot()
+    def _on_reading_started(self):
+        """朗读开始时更新按钮状态（GUI线程）"""
+        self.start_button.setDisabled(True)
+        self.pause_button.setDisabled(False)
+
+    @pyqtSlot()
+    def _on_reading_stopped(self):
+        """朗读循环退出后恢复按钮并清除高亮（GUI线程）"""
+        self.start_button.setEnabled(True) # 重新启用开始朗读按钮
+        self.pause_button.setEnabled(False) # 禁用暂停按钮
+        self.pause_button.setText("暂停")
+        self.clear_all_highlights()
+
+    @staticmethod
+    def _report_stop_result(future):
+        """停止音频的回调，只在失败时输出警告"""
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Warning: Failed to stop audio player: {future.exception()}")
 
     def stop_reading(self):
-        """停止朗读并清理资源"""
-        self.stop_reading_flag = True  # 设置停止标志为 True
+        """停止朗读并清理资源，返回停止音频的 Future（没有播放器时为 None），不等待其完成"""
+        self._request_stop()
         self.clear_all_highlights()
         self.is_reading_paused = False
         self.pause_button.setText("暂停")
@@ -786,16 +1031,21 @@ class AutoReaderApp(QMainWindow):
                 self.loop
             )
             print("stop vodio reading")
-            try:
-                # 等待异步操作完成，但设置超时
-                future.result(timeout=1.0)
-            except Exception as e:
-                print(f"Warning: Failed to stop audio player: {e}")
+            # 不在GUI线程中等待，结果由回调处理
+            future.add_done_callback(self._report_stop_result)
+            return future
+        return None
 
     def pause_resume_reading(self):
         """暂停或继续朗读"""
         self.is_reading_paused = not self.is_reading_paused
         self.pause_button.setText("继续" if self.is_reading_paused else "暂停")
+        if self.is_reading_paused:
+            self.start_button.setEnabled(True) # 当朗读暂停时，重新启用开始朗读按钮
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(
+                self.resume_event.clear if self.is_reading_paused else self.resume_event.set
+            )
 
         # 暂停/恢复音频播放（异步）
         if self.audio_player:
@@ -819,38 +1069,36 @@ class AutoReaderApp(QMainWindow):
             self.display_page(self.currently_displayed_page_num_0_indexed + 1)
 
     def update_outline_view(self):
-        # 创建大纲模型并更新视图
-        model = QStandardItemModel()
-        model.setHorizontalHeaderLabels(["目录"])
-        
-        # 用于跟踪每个级别的最后一个项目
-        last_items = {}
-        
-        for item in self.pdf_outline:
-            level = item['level']
-            # 在display_title后面添加页码信息
-            display_text = item['display_title']
-            if item['page'] is not None:
-                display_text += f"  ({item['page']})"
-            outline_item = QStandardItem(display_text)
-            outline_item.setData(item['page'], Qt.UserRole)
-            
-            # 确定父项
-            if level == 0:
-                model.appendRow(outline_item)
-            else:
-                parent_level = level - 1
-                if parent_level in last_items:
-                    last_items[parent_level].appendRow(outline_item)
-                else:
-                    # 如果没有找到父项，就添加到根级别
-                    model.appendRow(outline_item)
-            
-            last_items[level] = outline_item
-        
+        """在后台线程中构建目录模型，完成后由 outlineReady 信号交给GUI线程设置"""
+        outline = self.pdf_outline
+        # 旧目录项不再对应当前文档，先清空
+        self.outline_view.setModel(None)
+        self._outline_pages = []
+        self._outline_items = []
+        self._outline_highlight_idx = -1
+
+        def build():
+            try:
+                model, outline_index = build_outline_model(outline)
+                # 模型在工作线程中创建，交给GUI线程使用前移交线程归属
+                model.moveToThread(QApplication.instance().thread())
+                self.outlineReady.emit(outline, model, outline_index)
+            except Exception as e:
+                print(f"构建目录失败: {e}")
+        self.io_executor.submit(build)
+
+    @pyqtSlot(object, object, list)
+    def _apply_outline_model(self, outline, model, outline_index):
+        """设置后台构建好的目录模型（GUI线程）"""
+        if outline is not self.pdf_outline:
+            return  # 构建期间已打开了其他文档
+        self._outline_pages = [page for page, _ in outline_index]
+        self._outline_items = [outline_item for _, outline_item in outline_index]
+        self._outline_highlight_idx = -1
+
         self.outline_view.setModel(model)
-        self.outline_view.clicked.connect(self.outline_item_clicked)
         self.outline_view.expandAll()  # 展开所有节点
+        self._highlight_current_outline_item(self.currently_displayed_page_num_0_indexed)
 
     def outline_item_clicked(self, index):
         page_data = index.data(Qt.UserRole)
@@ -859,6 +1107,22 @@ class AutoReaderApp(QMainWindow):
             if page_num_0_indexed >= 0:
                 self.display_page(page_num_0_indexed)
 
+    def request_highlight(self, text, page_num):
+        """从任意线程请求高亮段落；GUI线程处理之前到达的请求只保留最新一个"""
+        with self._highlight_lock:
+            scheduled = self._pending_highlight is not None
+            self._pending_highlight = (text, page_num)
+        if not scheduled:
+            QMetaObject.invokeMethod(self, "_flush_highlight", Qt.QueuedConnection)
+
+    @pyqtSlot()
+    def _flush_highlight(self):
+        """执行最新一次高亮请求（GUI线程）"""
+        with self._highlight_lock:
+            pending, self._pending_highlight = self._pending_highlight, None
+        if pending is not None:
+            self.highlight_paragraph(*pending)
+
     @pyqtSlot(str, int)
     def highlight_paragraph(self, text, page_num):
         """高亮显示当前朗读段落并自动滚动到该位置"""
@@ -868,48 +1132,55 @@ class AutoReaderApp(QMainWindow):
         if page_num_0_indexed != self.currently_displayed_page_num_0_indexed:
             self.display_page(page_num_0_indexed)
         
-        # 获取当前页面的完整文本
-        current_text = self.text_display.toPlainText()
-        
-        # 清理和规范化文本以便更好地匹配
-        def normalize_text(t):
-            # 移除多余的空白字符
-            return ' '.join(t.split())
-        
         text_to_find = normalize_text(text)
-        current_page_text = normalize_text(current_text)
         
-        # 在当前页面文本中查找目标文本的位置
-        start_pos = current_page_text.find(text_to_find)
+        # 在当前页面文本中查找目标文本的位置：先查缓存，再从上一段之后向后扫描
+        start_pos = self._paragraph_offsets.get(text_to_find)
+        if start_pos is None:
+            start_pos = self._page_plain_text.find(text_to_find, self._highlight_search_pos)
+            if start_pos < 0 and self._highlight_search_pos > 0:
+                start_pos = self._page_plain_text.find(text_to_find)
+            self._paragraph_offsets[text_to_find] = start_pos
         
-        if start_pos >= 0:
-            # 创建光标并设置选择区域
+        if start_pos >= 0 and text_to_find:
+            self._highlight_search_pos = start_pos + len(text_to_find)
+            # 规范化文本中的位置换算回文档位置，原文中的换行、多余空白也在高亮范围内
+            doc_start = self._page_text_offsets[start_pos]
+            doc_end = self._page_text_offsets[start_pos + len(text_to_find) - 1] + 1
             cursor = self.text_display.textCursor()
-            cursor.setPosition(start_pos)
-            cursor.setPosition(start_pos + len(text_to_find), QTextCursor.KeepAnchor)
+            cursor.setPosition(doc_start)
+            cursor.setPosition(doc_end, QTextCursor.KeepAnchor)
             
             # 应用高亮格式
             fmt = QTextCharFormat()
             fmt.setBackground(QColor("#FFF4D6"))  # 柔和的浅黄色
             cursor.mergeCharFormat(fmt)
+            self._has_highlight = True
+            self._last_highlight_range = (doc_start, doc_end, page_num_0_indexed)
             
-            # 更新光标位置以确保可见
-            self.text_display.setTextCursor(cursor)
-            self.text_display.ensureCursorVisible()
-            
-            # 清除选中状态但保持高亮
+            # 清除选中状态但保持高亮，光标停在段落末尾并滚动到可见
             cursor.clearSelection()
             self.text_display.setTextCursor(cursor)
+            self.text_display.ensureCursorVisible()
             
             print(f"成功高亮文本: '{text_to_find[:30]}...'")
         else:
             print(f"高亮提示: 文本未在当前页面找到: '{text_to_find[:30]}...'")
-            print(f"页面文本前100个字符: '{current_page_text[:100]}...'")
+            print(f"页面文本前100个字符: '{self._page_plain_text[:100]}...'")
 
     def clear_all_highlights(self):
         """清除文本显示区域的所有背景高亮"""
+        if not self._has_highlight:
+            return
+        self._has_highlight = False
         cursor = self.text_display.textCursor()
-        cursor.select(QTextCursor.Document) # 选中整个文档
+        last_range, self._last_highlight_range = self._last_highlight_range, None
+        if last_range and last_range[2] == self.currently_displayed_page_num_0_indexed:
+            # 只有上一次高亮的段落带背景，只清除这一段
+            cursor.setPosition(last_range[0])
+            cursor.setPosition(last_range[1], QTextCursor.KeepAnchor)
+        else:
+            cursor.select(QTextCursor.Document) # 选中整个文档
         fmt = QTextCharFormat()
         fmt.setBackground(Qt.transparent) # 设置透明背景
         cursor.mergeCharFormat(fmt) # 应用格式
@@ -919,43 +1190,47 @@ class AutoReaderApp(QMainWindow):
     def closeEvent(self, event):
         """关闭应用程序时的处理"""
         try:
-            # 停止所有正在进行的任务
-            self.stop_reading()
+            # 停止所有正在进行的任务（包括音频播放），不等待完成
+            stop_future = self.stop_reading()
             
-            # 保存设置
+            # 保存设置，退出前立即写盘
             self.save_settings()
+            self._flush_settings(blocking=True)
             
-            # 关闭PDF文档
-            if self.pdf_doc:
-                self.pdf_doc.close()
+            # 关闭PDF文档；朗读循环可能仍在 io_executor 中解析页面，与 load_pdf_content 一样持锁关闭
+            with self._pdf_doc_lock:
+                if self.pdf_doc:
+                    self.pdf_doc.close()
+                    self.pdf_doc = None
             
-            # 确保音频播放器停止（异步）
-            if self.audio_player:
-                print("stop vodio 2")
-                future = asyncio.run_coroutine_threadsafe(
-                    self.audio_player.stop_current_audio(),
-                    self.loop
-                )
-                try:
-                    # 等待异步操作完成，但设置超时
-                    future.result(timeout=5.0)
-                except Exception as e:
-                    print(f"Warning: Audio cleanup timed out or failed: {e}")
-
-            # 清理异步相关资源
-            if self.loop and self.loop.is_running():
-                self.loop.call_soon_threadsafe(self.loop.stop)
-            if self.thread and self.thread.is_alive():
-                self.thread.join(timeout=1.0)
-            if self.executor:
-                self.executor.shutdown(wait=False)
+            # 音频停止（其中要用 io_executor 关闭音频流）之后再关闭线程池、结束事件循环；
+            # 窗口不等待，事件循环线程随进程退出
+            if stop_future:
+                stop_future.add_done_callback(lambda f: self._shutdown_workers())
+            else:
+                self._shutdown_workers()
                 
         except Exception as e:
             print(f"关闭时发生错误: {e}")
             
         event.accept()
 
+    def _shutdown_workers(self):
+        """关闭各线程池、进程池并结束事件循环"""
+        try:
+            if self.tts_executor:
+                self.tts_executor.shutdown(wait=False)
+            if self.io_executor:
+                self.io_executor.shutdown(wait=False)
+            if self.page_extractor:
+                self.page_extractor.shutdown(wait=False, cancel_futures=True)
+            if self.loop and self.loop.is_running():
+                self.loop.call_soon_threadsafe(self.loop.stop)
+        except Exception as e:
+            print(f"关闭后台任务时发生错误: {e}")
+
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # PyInstaller 打包后页面提取进程池需要
     app = QApplication(sys.argv)
     
     # 设置全局字体
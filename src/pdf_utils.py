@@ -1,5 +1,41 @@
-import asyncio
+import collections
 import re
+import fitz
+
+# 阿拉伯数字到中文数字的映射
+_DIGIT_TABLE = str.maketrans('0123456789', '零一二三四五六七八九')
+
+# 没有目录时用来生成伪目录的章节标题模式：
+# - 空格、制表符和全角空格（\u3000），
+# - 0-9 和全角的０-９ 表示阿拉伯数字，
+# - 一二三四五六七八九十百千零〇 表示匹配这些常见的中文数字。
+# 中括号 [] 表示匹配其中任意一个字符，后面的加号 + 表示匹配前面字符集合中一个或多个字符。
+# 用显式字符代替 \s、\d，匹配时不必查询 Unicode 字符属性。
+_FAKE_TOC_RE = re.compile(r"第[ \t\u30000-9０-９一二三四五六七八九十百千零〇]+[章节篇回卷][^\n\r]{0,30}")
+
+# MuPDF 内部缓存的上限（字节），超过时收缩，避免长时间朗读时内存持续增长
+MUPDF_STORE_LIMIT = 64 << 20
+
+# 页面提取进程中打开的文档及其路径，每个工作进程各自持有一份，路径变化时重新打开
+_worker_doc = None
+_worker_doc_path = None
+
+def trim_mupdf_store():
+    """MuPDF 缓存超过 MUPDF_STORE_LIMIT 时释放一半"""
+    if fitz.TOOLS.store_size > MUPDF_STORE_LIMIT:
+        fitz.TOOLS.store_shrink(50)
+
+def extract_page_text(pdf_path, page_num):
+    """在工作进程中提取单页文本（0基页码），首次用到或换了文件时才打开PDF"""
+    global _worker_doc, _worker_doc_path
+    if _worker_doc_path != pdf_path:
+        if _worker_doc:
+            _worker_doc.close()
+        _worker_doc = fitz.open(pdf_path)
+        _worker_doc_path = pdf_path
+    text = _worker_doc.load_page(page_num).get_text("text")
+    trim_mupdf_store()
+    return text
 
 def get_pdf_outline(pdf_doc):
     """Extracts the outline (table of contents) from the PDF document object."""
@@ -20,17 +56,11 @@ def get_pdf_outline(pdf_doc):
     
     if not outline_data:
         print("未找到目录，尝试通过正则匹配生成伪目录...")
-
-        # - \s 表示匹配任意空白字符（包括空格、制表符等），
-        # - \d 表示匹配任意阿拉伯数字（0-9），
-        # - 一二三四五六七八九十百千零〇 表示匹配这些常见的中文数字。
-        # 中括号 [] 表示匹配其中任意一个字符，后面的加号 + 表示匹配前面字符集合中一个或多个字符。
-        pattern = re.compile(r"第[\s\d一二三四五六七八九十百千零〇]+[章节篇回卷][^\n\r]{0,30}", re.UNICODE)
         for page_idx in range(pdf_doc.page_count):
             try:
                 page = pdf_doc.load_page(page_idx)
                 text = page.get_text("text")
-                for match in pattern.finditer(text):
+                for match in _FAKE_TOC_RE.finditer(text):
                     title = match.group().strip()
                     outline_data.append({
                         'original_title': title,
@@ -98,65 +128,91 @@ def get_pdf_outline(pdf_doc):
 #         print(f"生成文本块时出错: {e}")
 #         return
 
+# 把各种句末标点统一成 。，每页转换一次后即可用 str.find 查找单个字符
+_SENTENCE_END_TABLE = str.maketrans('！？；', '。。。')
+
+def _find_chunk_end(pieces, pos, skip):
+    """在 pieces（第一段从 pos 开始）中跳过 skip 个字符后查找第一个句末标点，
+    返回从 pos 到标点（含）的字符数，找不到时返回 -1"""
+    offset = -pos  # 当前段起点相对 pos 的位置
+    for piece, marked in pieces:
+        start = max(skip - offset, 0)
+        if start < len(piece):
+            idx = marked.find('。', start)
+            if idx >= 0:
+                return offset + idx + 1
+        offset += len(piece)
+    return -1
+
+def _take_chars(pieces, pos, count):
+    """从 pieces 的 pos 处取出 count 个字符，用完的段随即丢弃，返回 (文本, 新的 pos)"""
+    parts = []
+    while count > 0:
+        piece = pieces[0][0]
+        n = min(len(piece) - pos, count)
+        parts.append(piece[pos:pos + n])
+        count -= n
+        pos += n
+        if pos >= len(piece):
+            pieces.popleft()
+            pos = 0
+    return ''.join(parts), pos
+
 async def extract_text_chunks_from_range(pdf_doc_obj_gui, start_page_0_indexed, end_page_0_indexed,
                                        chunk_length=50, stop_reading_flag=None,
-                                       text_cleaner_func=None):
-    """异步生成文本块"""
+                                       text_cleaner_func=None, page_text_loader=None):
+    """异步生成文本块
+
+    page_text_loader(page_idx) 是返回页面文本的协程函数，
+    提供时从预取缓存中等待页面文本，不再在事件循环线程中解析页面。
+    """
     try:
         current_page_idx = start_page_0_indexed
-        text_buffer = ""
+        # 尚未切完的各页文本按页保存为 (原文, 标点统一后的文本)，不拼接成一个不断增长的字符串；
+        # 切块时只拼接块本身，整体为线性复杂度
+        pieces = collections.deque()
+        pos = 0  # pieces[0] 中尚未切出的文本起点
+        available = 0  # pieces 中尚未切出的字符数
+        scanned = 0  # 从 pos 起已确认没有句末标点的字符数，下一页到来时不再重复扫描
         paragraph_index = 0
         # last_page_idx_for_chunk_assignment = start_page_0_indexed # This variable was unused
 
-        punctuation_pattern = re.compile(r'[。！？；]')
-
-        # 阿拉伯数字到中文数字的映射
-        arabic_to_chinese = {
-            '0': '零',
-            '1': '一',
-            '2': '二',
-            '3': '三',
-            '4': '四',
-            '5': '五',
-            '6': '六',
-            '7': '七',
-            '8': '八',
-            '9': '九'
-        }
-
         while current_page_idx <= end_page_0_indexed and (not stop_reading_flag or not stop_reading_flag.is_set()):
             # 异步加载页面文本
             try:
-                page = pdf_doc_obj_gui.load_page(current_page_idx)
-                text = page.get_text("text")
+                if page_text_loader:
+                    text = await page_text_loader(current_page_idx)
+                else:
+                    page = pdf_doc_obj_gui.load_page(current_page_idx)
+                    text = page.get_text("text")
 
                 # 将阿拉伯数字替换为中文数字
-                for arabic, chinese in arabic_to_chinese.items():
-                    text = text.replace(arabic, chinese)
-                text_buffer += text # Append text from current page to buffer
+                text = text.translate(_DIGIT_TABLE)
+                pieces.append((text, text.translate(_SENTENCE_END_TABLE)))
+                available += len(text)
 
-                # Process text_buffer to create chunks
+                # Process the buffered text to create chunks
                 # Continue chunking as long as buffer is long enough AND we can find a chunk boundary
-                while len(text_buffer) >= chunk_length:
+                while available >= chunk_length:
                     if stop_reading_flag and stop_reading_flag.is_set():
                         return
 
                     # Search for the first punctuation after chunk_length - 1
-                    search_start_index = chunk_length - 1
-                    match = punctuation_pattern.search(text_buffer, search_start_index)
+                    chunk_size = _find_chunk_end(pieces, pos, max(chunk_length - 1, scanned))
 
-                    if match:
+                    if chunk_size >= 0:
                         # Punctuation found, chunk ends at punctuation
-                        chunk_end_index = match.end() # end() gives the index after the match
-                        chunk_text = text_buffer[:chunk_end_index]
-                        text_buffer = text_buffer[chunk_end_index:]
+                        chunk_text, pos = _take_chars(pieces, pos, chunk_size)
+                        available -= chunk_size
+                        scanned = 0
 
-                        if chunk_text.strip():
+                        chunk_text = chunk_text.strip()
+                        if chunk_text:
                             # Clean and yield the chunk
-                            cleaned_text = text_cleaner_func(chunk_text.strip()) if text_cleaner_func else chunk_text.strip()
+                            cleaned_text = text_cleaner_func(chunk_text) if text_cleaner_func else chunk_text
 
                             chunk_data = {
-                                "text": chunk_text.strip(),
+                                "text": chunk_text,
                                 "tts_text": cleaned_text,
                                 "page": current_page_idx + 1,  # Assign current page number (approximation)
                                 "paragraph": paragraph_index
@@ -164,22 +220,21 @@ async def extract_text_chunks_from_range(pdf_doc_obj_gui, start_page_0_indexed,
                             yield chunk_data
                             paragraph_index += 1
 
-                            # Allow other协程执行
-                            await asyncio.sleep(0)
-
                     else:
                         # No punctuation found after chunk_length in the current buffer.
                         # If this is the last page, yield the remaining buffer.
                         # Otherwise, break inner loop to load next page and continue searching.
                         if current_page_idx == end_page_0_indexed:
                             # Last page, yield remaining text as the final chunk
-                            chunk_text = text_buffer
-                            text_buffer = ""
+                            chunk_text, pos = _take_chars(pieces, pos, available)
+                            available = 0
+                            scanned = 0
 
-                            if chunk_text.strip():
-                                cleaned_text = text_cleaner_func(chunk_text.strip()) if text_cleaner_func else chunk_text.strip()
+                            chunk_text = chunk_text.strip()
+                            if chunk_text:
+                                cleaned_text = text_cleaner_func(chunk_text) if text_cleaner_func else chunk_text
                                 chunk_data = {
-                                    "text": chunk_text.strip(),
+                                    "text": chunk_text,
                                     "tts_text": cleaned_text,
                                     "page": current_page_idx + 1, # Assign last page number (approximation)
                                     "paragraph": paragraph_index
@@ -191,6 +246,7 @@ async def extract_text_chunks_from_range(pdf_doc_obj_gui, start_page_0_indexed,
                             break
                         else:
                             # Not the last page, break inner loop to load more text from the next page
+                            scanned = available
                             break # Break the inner while loop, outer loop continues
 
                 current_page_idx += 1
@@ -200,10 +256,9 @@ async def extract_text_chunks_from_range(pdf_doc_obj_gui, start_page_0_indexed,
                 current_page_idx += 1
                 continue
 
-        # The remaining text in text_buffer should be handled by the 'last page' logic in the inner loop.
-        # No need for an extra check here unless there's a scenario where the inner loop might exit
-        # with remaining text *before* hitting the last page logic (e.g., stop_reading_flag set).
-        # However, the stop_reading_flag check is at the start of loops and before yielding, so it should be fine.
+        # Text still in `pieces` (`available` characters starting at `pos` in pieces[0]) is flushed by the
+        # 'last page' branch of the inner loop, which only runs while at least chunk_length characters remain.
+        # A shorter tail on the last page, or text left when stop_reading_flag ends the loops early, is not yielded.
 
     except Exception as e:
         print(f"生成文本块时出错: {e}")
@@ -36,26 +36,32 @@ DEFAULT_TTS_MODEL_CFG_JSON_STR = json.dumps(dict(dim=1024, depth=22, heads=16, f
 DEFAULT_VOCODER_LOCAL_PATH = os.path.join(base_path, 'resources', 'vocos-mel-24khz')
 DEFAULT_SPEED = 1.0
 DEFAULT_SEED = 1
+# 在 CUDA 上用 torch.compile 编译 DiT 和声码器；Windows 上缺少 Inductor 需要的 Triton，不启用
+TTS_COMPILE = sys.platform != "win32" and hasattr(torch, "compile") and torch.cuda.is_available()
+WARMUP_TEXT = "你好。"
+MIN_NFE_STEPS = 16  # 短句使用的最少扩散步数
+
+_DIGIT_TABLE = str.maketrans('0123456789', '零一二三四五六七八九')
+_WS_RE = re.compile(r"[\s\u3000]+")
 
 def arabic_to_chinese_digits(text):
-    num_map = {
-        '0': '零', '1': '一', '2': '二', '3': '三',
-        '4': '四', '5': '五', '6': '六', '7': '七',
-        '8': '八', '9': '九'
-    }
-    return ''.join(num_map.get(c, c) for c in text)
+    return text.translate(_DIGIT_TABLE)
 
 def clean_text_for_tts(text):
-    text = re.sub(r"[\s\u3000]+", " ", text)
-    text = text.strip()
-    return text
+    return _WS_RE.sub(" ", text).strip()
+
+def adaptive_nfe_steps(text, short_length):
+    """按文本长度选择扩散步数：只有短于 short_length 的文本减少步数，其余使用默认步数"""
+    if len(text) >= short_length:
+        return default_nfe_step
+    return max(MIN_NFE_STEPS, min(default_nfe_step, 6 + len(text) // 2))
 
 def _load_f5tts_model_internal(model_path_gui, vocab_path_gui, model_config_json_gui):
     try:
         ckpt_path = str(cached_path(model_path_gui))
         model_config_dict = json.loads(model_config_json_gui or DEFAULT_TTS_MODEL_CFG_JSON_STR)
         model = f5_load_model(DiT, model_config_dict, ckpt_path, vocab_file=vocab_path_gui)
-        return model
+        return model.eval()
     except Exception as e:
         print(f"Error loading F5TTS model: {e}")
         return None
@@ -63,11 +69,21 @@ def _load_f5tts_model_internal(model_path_gui, vocab_path_gui, model_config_json
 def _load_tts_vocoder_internal(vocoder_local_path_gui):
     try:
         vocoder_instance = f5_load_vocoder(is_local=True, local_path=vocoder_local_path_gui or DEFAULT_VOCODER_LOCAL_PATH)
-        return vocoder_instance
+        return vocoder_instance.eval()
     except Exception as e:
         print(f"Error loading TTS vocoder: {e}")
         return None
 
+def _compile_models(model, vocoder):
+    """编译模型中反复调用的部分，编译失败时自动退回普通执行"""
+    try:
+        torch._dynamo.config.suppress_errors = True
+        # 每块文本长度不同，按动态形状编译，避免每个新长度都重新编译
+        model.transformer = torch.compile(model.transformer, dynamic=True)
+        vocoder.decode = torch.compile(vocoder.decode, dynamic=True)
+    except Exception as e:
+        print(f"torch.compile failed, using eager mode: {e}")
+
 def load_tts_resources(model_path_gui, vocab_path_gui, model_config_json_gui,
                        ref_audio_path_gui, ref_text_gui, vocoder_local_path_gui):
     global _F5TTS_model, _vocoder, _ref_audio_processed, _ref_text_processed
@@ -78,6 +94,8 @@ def load_tts_resources(model_path_gui, vocab_path_gui, model_config_json_gui,
 
     if not _vocoder or not _F5TTS_model:
         return False
+    if TTS_COMPILE:
+        _compile_models(_F5TTS_model, _vocoder)
 
     if (_current_ref_audio_path != ref_audio_path_gui or
             _current_ref_text_from_gui != ref_text_gui or
@@ -92,10 +110,21 @@ def load_tts_resources(model_path_gui, vocab_path_gui, model_config_json_gui,
             return False
     return _F5TTS_model is not None and _vocoder is not None and _ref_audio_processed is not None
 
+def warmup_tts():
+    """合成一句短文本，把 CUDA 初始化、算子选择（以及编译）的开销放在开始朗读之前。
+    cuBLAS 句柄按线程创建，须在之后执行合成的线程中调用"""
+    if not is_tts_ready():
+        return
+    try:
+        generate_audio_chunk(WARMUP_TEXT, DEFAULT_SPEED)
+    except Exception as e:
+        print(f"TTS warmup failed: {e}")
+
 def is_tts_ready():
     return _F5TTS_model is not None and _vocoder is not None and _ref_audio_processed is not None
 
-def generate_audio_chunk(text_for_tts, tts_speed, seed=DEFAULT_SEED, nfe_steps_override=None):
+def generate_audio_chunk(text_for_tts, tts_speed, seed=DEFAULT_SEED, nfe_steps_override=None,
+                         buffer_pool=None):
     if not is_tts_ready():
         raise RuntimeError("TTS resources are not loaded. Call load_tts_resources first.")
 
@@ -108,19 +137,27 @@ def generate_audio_chunk(text_for_tts, tts_speed, seed=DEFAULT_SEED, nfe_steps_o
         if _ref_audio_processed is None or _ref_text_processed is None:
             raise ValueError("Reference audio/text not preprocessed.")
 
-        audio_chunk_data, sample_rate, _ = infer_process(
-            _ref_audio_processed,
-            _ref_text_processed,
-            str(cleaned_text),
-            _F5TTS_model,
-            _vocoder,
-            cross_fade_duration=cross_fade_duration,
-            nfe_step=current_nfe_step,
-            speed=tts_speed,
-            progress=None,
-        )
-        if audio_chunk_data.dtype != np.float32:
-            audio_chunk_data = audio_chunk_data.astype(np.float32)
+        # 纯推理，不记录 autograd 信息
+        with torch.inference_mode():
+            audio_chunk_data, sample_rate, _ = infer_process(
+                _ref_audio_processed,
+                _ref_text_processed,
+                str(cleaned_text),
+                _F5TTS_model,
+                _vocoder,
+                cross_fade_duration=cross_fade_duration,
+                nfe_step=current_nfe_step,
+                speed=tts_speed,
+                progress=None,
+            )
+        if audio_chunk_data.dtype != np.float32 and buffer_pool is not None:
+            # 从播放器的缓冲池取 float32 数组，避免每块重新分配
+            converted = buffer_pool.acquire(audio_chunk_data.size)
+            np.copyto(converted, audio_chunk_data.reshape(-1))
+            audio_chunk_data = converted
+        else:
+            # 已是连续的 float32 时不复制
+            audio_chunk_data = np.ascontiguousarray(audio_chunk_data, dtype=np.float32)
         return audio_chunk_data, sample_rate
     except Exception as e:
         print(f"ERROR: TTS generation failed for chunk: '{cleaned_text}'")